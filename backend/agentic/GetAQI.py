@@ -1,33 +1,67 @@
-import requests
-import pandas as pd
-from datetime import datetime
-import os
-import time
+import numpy as np
+from datetime import datetime, timedelta
+
+from http_session import SESSION
+from csv_log import append_log_row, read_last_row
+from month_cache import load_cache, save_cache
 
 # --- CONFIGURATION ---
 # Delhi Coordinates (Connaught Place)
 LAT = 28.61
 LON = 77.20
 LOG_FILE = "daily_aqi_log.csv"
+CACHE_FILE = "aqi_month_cache.json"
+
+# Numba is optional: when installed, the conversion runs as a compiled
+# single-pass kernel; otherwise the NumPy searchsorted path below is used.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# CPCB breakpoint tables, precomputed once. Segment i covers
+# (lower bound _AQI_BP[i], next bound], with AQI = base + (pm25 - lower) * slope.
+_AQI_BP    = np.array([0.0, 30.0, 60.0, 90.0, 120.0, 250.0])
+_AQI_BASE  = np.array([0.0, 50.0, 100.0, 200.0, 300.0, 400.0])
+_AQI_SLOPE = np.array([50/30, 50/30, 100/30, 100/30, 100/130, 100/130])
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _aqi_kernel(x):
+        # One fused loop over the hourly samples - no intermediate mask
+        # or gather arrays, and the breakpoint ladder compiles down to
+        # branch-predicted scalar ops.
+        out = np.empty_like(x)
+        for i in range(x.shape[0]):
+            v = x[i]
+            if v <= 30:
+                out[i] = v * (50/30)
+            elif v <= 60:
+                out[i] = 50 + (v - 30) * (50/30)
+            elif v <= 90:
+                out[i] = 100 + (v - 60) * (100/30)
+            elif v <= 120:
+                out[i] = 200 + (v - 90) * (100/30)
+            elif v <= 250:
+                out[i] = 300 + (v - 120) * (100/130)
+            else:
+                out[i] = 400 + (v - 250) * (100/130)
+        return out
 
 def calculate_indian_aqi(pm25):
     """
     Converts raw PM2.5 (µg/m³) to Indian AQI (CPCB Standard).
     This logic follows the breakpoints defined by CPCB, India.
+    Vectorized and branchless: a single searchsorted locates the
+    breakpoint segment for every value, then one gather + multiply-add
+    produces the AQI - one pass over the data instead of six masked
+    comparisons.
     """
-    if pm25 <= 30:
-        return pm25 * (50/30)
-    elif pm25 <= 60:
-        return 50 + (pm25 - 30) * (50/30)
-    elif pm25 <= 90:
-        return 100 + (pm25 - 60) * (100/30)
-    elif pm25 <= 120:
-        return 200 + (pm25 - 90) * (100/30)
-    elif pm25 <= 250:
-        return 300 + (pm25 - 120) * (100/130)
-    else:
-        # Severe (> 250 µg/m³)
-        return 400 + (pm25 - 250) * (100/130)
+    x = np.asarray(pm25, dtype=np.float64)
+    if njit is not None and x.ndim == 1:
+        return _aqi_kernel(x)
+    idx = np.searchsorted(_AQI_BP[1:], x, side='left')
+    return _AQI_BASE[idx] + (x - _AQI_BP[idx]) * _AQI_SLOPE[idx]
 
 def get_current_month_aqi():
     """
@@ -40,10 +74,23 @@ def get_current_month_aqi():
     # 1. Define Timeframe (1st of Month -> Today)
     today = datetime.today().date()
     first_day = today.replace(day=1)
-    
-    start_str = first_day.strftime("%Y-%m-%d")
-    end_str = today.strftime("%Y-%m-%d")
-    
+    month_key = today.strftime("%Y-%m")
+    today_str = today.strftime("%Y-%m-%d")
+
+    # Month cache: per-day AQI averages for complete days survive across
+    # runs, so a daily cron only downloads the days it hasn't seen yet.
+    cache = load_cache(CACHE_FILE, month_key)
+    if cache and cache.get("daily_avg"):
+        cached_days = cache["daily_avg"]
+        last_day = datetime.strptime(max(cached_days), "%Y-%m-%d").date()
+        fetch_from = last_day + timedelta(days=1)
+    else:
+        cached_days = {}
+        fetch_from = first_day
+
+    start_str = fetch_from.strftime("%Y-%m-%d")
+    end_str = today_str
+
     print(f"   -> Fetching PM2.5 data from {start_str} to {end_str}...")
 
     # 2. Build API Request
@@ -59,7 +106,7 @@ def get_current_month_aqi():
     }
 
     try:
-        response = requests.get(url, params=params, timeout=10) # Added timeout
+        response = SESSION.get(url, params=params, timeout=10) # Added timeout
         response.raise_for_status()
         data = response.json()
         
@@ -71,25 +118,44 @@ def get_current_month_aqi():
         if not pm25_values:
             raise ValueError("No data returned from API")
 
-        # Create DataFrame
-        df = pd.DataFrame({
-            'time': pd.to_datetime(timestamps),
-            'pm25': pm25_values
-        })
-        
         # 4. Convert to Indian AQI
-        # We apply the conversion to every hourly data point
-        df['indian_aqi'] = df['pm25'].apply(calculate_indian_aqi)
-        
+        # One vectorized call over every hourly data point
+        aqi_arr = calculate_indian_aqi(np.asarray(pm25_values, dtype=np.float64))
+
         # 5. Calculate Daily Metrics based on Indian AQI
-        df.set_index('time', inplace=True)
-        daily_avg_aqi = df['indian_aqi'].resample('D').mean() # Indian AQI uses 24hr Avg
-        
+        # The hourly ISO timestamps share a 'YYYY-MM-DD' prefix per day, so
+        # reducing over day boundaries gives the 24hr averages directly -
+        # no DatetimeIndex / resample machinery needed (and it handles the
+        # partial final day correctly). Open-Meteo reports missing hours
+        # as null (NaN here), so reduce zero-filled values and the
+        # valid-hour mask over the same boundaries: null hours are
+        # skipped per day like resample('D').mean() did, not propagated
+        # into the cache. Days with no valid hours at all are dropped.
+        days = np.array([t[:10] for t in timestamps])
+        unique_days, day_starts = np.unique(days, return_index=True)
+        valid = ~np.isnan(aqi_arr)
+        day_sums = np.add.reduceat(np.where(valid, aqi_arr, 0.0), day_starts)
+        day_counts = np.add.reduceat(valid.astype(np.int64), day_starts)
+        has_data = day_counts > 0
+        unique_days = unique_days[has_data]
+        new_daily = day_sums[has_data] / day_counts[has_data]  # Indian AQI uses 24hr Avg
+
+        # Merge with cached days and persist the complete ones (today's
+        # partial average gets refreshed on the next run).
+        daily_map = dict(cached_days)
+        daily_map.update({d: float(v) for d, v in zip(unique_days, new_daily)})
+        save_cache(CACHE_FILE, {
+            "month": month_key,
+            "daily_avg": {d: v for d, v in daily_map.items() if d < today_str}
+        })
+
+        daily_avg_aqi = np.fromiter(daily_map.values(), dtype=np.float64)
+
         # A. Monthly Average
         monthly_avg = daily_avg_aqi.mean()
-        
+
         # B. Days Severe (Indian Standard: AQI > 400 is Severe)
-        severe_days = (daily_avg_aqi > 300).sum() 
+        severe_days = (daily_avg_aqi > 300).sum()
         
         results = {
             'Monthly_Avg_AQI': round(monthly_avg, 2),
@@ -101,9 +167,7 @@ def get_current_month_aqi():
         log_entry['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry['data_source'] = "Open-Meteo (Converted to CPCB)"
         
-        df_log = pd.DataFrame([log_entry])
-        header = not os.path.exists(LOG_FILE)
-        df_log.to_csv(LOG_FILE, mode='a', header=header, index=False)
+        append_log_row(LOG_FILE, log_entry)
         
         print(f"✅ Success. Data logged to {LOG_FILE}")
         print(f"   -> Results (Indian Scale): Avg AQI: {results['Monthly_Avg_AQI']}, Severe Days: {results['Days_Severe_AQI']}")
@@ -115,25 +179,17 @@ def get_current_month_aqi():
         print("   ⚠️ API Unavailable. Attempting to read from local CSV backup...")
         
         # --- FALLBACK MECHANISM ---
-        if os.path.exists(LOG_FILE):
-            try:
-                df = pd.read_csv(LOG_FILE)
-                if not df.empty:
-                    # Get the last row
-                    last_entry = df.iloc[-1]
-                    results = {
-                        'Monthly_Avg_AQI': float(last_entry.get('Monthly_Avg_AQI', 0)),
-                        'Days_Severe_AQI': int(last_entry.get('Days_Severe_AQI', 0))
-                    }
-                    print(f"   📂 Loaded Fallback Data from {LOG_FILE}")
-                    print(f"   -> Results: Avg AQI: {results['Monthly_Avg_AQI']}, Severe Days: {results['Days_Severe_AQI']}")
-                    return results
-                else:
-                    print("   ❌ CSV exists but is empty.")
-            except Exception as csv_err:
-                print(f"   ❌ Failed to read CSV: {csv_err}")
-        else:
-            print(f"   ❌ CSV {LOG_FILE} not found.")
+        # Tail-read the last logged row (O(1) I/O, no pandas parse)
+        last_entry = read_last_row(LOG_FILE)
+        if last_entry:
+            results = {
+                'Monthly_Avg_AQI': float(last_entry.get('Monthly_Avg_AQI', 0)),
+                'Days_Severe_AQI': int(last_entry.get('Days_Severe_AQI', 0))
+            }
+            print(f"   📂 Loaded Fallback Data from {LOG_FILE}")
+            print(f"   -> Results: Avg AQI: {results['Monthly_Avg_AQI']}, Severe Days: {results['Days_Severe_AQI']}")
+            return results
+        print(f"   ❌ No usable backup entry in {LOG_FILE}.")
 
         # Final Fallback if everything fails
         return {'Monthly_Avg_AQI': 0, 'Days_Severe_AQI': 0}
@@ -1,23 +1,32 @@
-import pandas as pd
 import urllib3
 
-# Monkey Patch for urllib3 (Fixes SSL issue in some environments)
-if int(urllib3.__version__.split('.')[0]) >= 2:
-    from urllib3.util import retry
-    class PatchedRetry(retry.Retry):
+from pytrends import request as pytrends_request
+from pytrends.request import TrendReq
+
+# pytrends still passes the urllib3 1.x 'method_whitelist' kwarg when it
+# builds a Retry; under urllib3 >= 2 translate it to 'allowed_methods'.
+# Only the Retry name inside pytrends.request is rebound - patching
+# urllib3.util.retry.Retry process-wide would run this shim for every
+# retry object of every HTTP client in the server.
+if int(urllib3.__version__.split('.')[0]) >= 2 and hasattr(pytrends_request, 'Retry'):
+    class PatchedRetry(pytrends_request.Retry):
         def __init__(self, *args, **kwargs):
             if 'method_whitelist' in kwargs:
                 kwargs['allowed_methods'] = kwargs.pop('method_whitelist')
             super().__init__(*args, **kwargs)
-    retry.Retry = PatchedRetry
+    pytrends_request.Retry = PatchedRetry
 # ----------------------------------------------------
 
-from pytrends.request import TrendReq
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import time
 import os
+import json
 import random
 
+from csv_log import append_log_row, read_last_row
+
 # --- CONFIGURATION ---
 KEYWORDS_LIST = [
     'asthma', 'sore throat', 'cough', 'cold',       # Respiratory
@@ -27,9 +36,86 @@ KEYWORDS_LIST = [
 ]
 
 LOG_FILE = "daily_trends_log.csv"
+CACHE_FILE = os.path.join("cache", "trends_day_cache.json")
 GEO_LOCATION = 'IN-DL' # Delhi
 CATEGORY = 419         # Health Category
 
+# Pool of TrendReq clients, one per batch slot, created lazily and
+# reused across calls so repeat runs keep their warm HTTP sessions
+# instead of re-handshaking with Google every time. TrendReq carries
+# mutable payload state, so each slot pairs its client with a lock:
+# concurrent scans hitting the same slot serialize on it instead of
+# interleaving build_payload/interest_over_time on one client.
+_TRENDREQ_POOL = {}
+_POOL_LOCK = threading.Lock()
+
+def _backoff_delay(prev, cap=30.0):
+    """
+    AWS-style decorrelated jitter: each wait is drawn from
+    [1s, 3 * previous wait], capped. Successive retries spread out
+    exponentially and de-synchronize from other clients hitting the
+    same 429 storm (unlike the old flat uniform(2, 4) sleep).
+    """
+    return min(cap, random.uniform(1.0, max(prev, 1.0) * 3))
+
+def _get_trendreq(slot):
+    with _POOL_LOCK:
+        entry = _TRENDREQ_POOL.get(slot)
+        if entry is None:
+            # We set retries=0 because we are handling retries manually below.
+            client = TrendReq(hl='en-US', tz=330, timeout=(10,25), retries=0, backoff_factor=0.1)
+            entry = (client, threading.Lock())
+            _TRENDREQ_POOL[slot] = entry
+        return entry
+
+def _fetch_batch(slot, batch, timeframe):
+    """
+    Fetches one keyword batch (max 5) on its slot's pooled TrendReq
+    connection. Retries 3 times with a jittered wait. Returns a dict of
+    keyword means, or None if all attempts failed.
+    """
+    pytrends, slot_lock = _get_trendreq(slot)
+    print(f"   -> Fetching batch: {batch}")
+
+    delay = 0.0
+    for attempt in range(3):
+        try:
+            # build_payload mutates the client, so the pair of calls
+            # must not interleave with another thread on this slot
+            with slot_lock:
+                pytrends.build_payload(batch, cat=CATEGORY, timeframe=timeframe, geo=GEO_LOCATION)
+                data = pytrends.interest_over_time()
+
+            if not data.empty:
+                if 'isPartial' in data.columns:
+                    data = data.drop(labels=['isPartial'], axis=1)
+
+                # Mean of the daily values retrieved so far: one C-level
+                # reduction over the underlying block instead of building
+                # an intermediate pandas Series per batch
+                means = data.to_numpy(dtype=float).mean(axis=0)
+                return dict(zip(data.columns, means.tolist()))
+
+            # If no data, assume 0
+            return {kw: 0.0 for kw in batch}
+
+        except Exception as e:
+            print(f"   ⚠️ Warning (Attempt {attempt+1}/3): {e}")
+            # Honor the server's Retry-After / rate-limit reset when the
+            # error carries a response; otherwise back off with jitter.
+            retry_after = None
+            resp = getattr(e, 'response', None)
+            if resp is not None:
+                retry_after = (resp.headers.get('Retry-After')
+                               or resp.headers.get('X-RateLimit-Reset'))
+            try:
+                delay = min(30.0, float(retry_after))
+            except (TypeError, ValueError):
+                delay = _backoff_delay(delay)
+            time.sleep(delay)
+
+    return None
+
 def get_current_month_trends():
     """
     Fetches the average interest for the CURRENT month so far.
@@ -37,12 +123,8 @@ def get_current_month_trends():
     FALLBACK: If API fails (429/Rate Limit), reads from the last logged CSV entry.
     """
     print(f"🤖 AGENT: Waking up to fetch Google Trends for {datetime.now().strftime('%B %Y')}...")
-    
-    # 1. Setup Connection
-    # We set retries=0 because we are handling retries manually below.
-    pytrends = TrendReq(hl='en-US', tz=330, timeout=(10,25), retries=0, backoff_factor=0.1)
-    
-    # 2. Define Timeframe (1st of Month -> Today)
+
+    # 1. Define Timeframe (1st of Month -> Today)
     today = datetime.today().date()
     first_day = today.replace(day=1)
     
@@ -53,73 +135,54 @@ def get_current_month_trends():
         timeframe = f"{first_day} {today}"
         print(f"   -> Timeframe: {timeframe}")
 
+    # The timeframe only changes once per day, so a same-day repeat run
+    # (multiple scans, restarts) can reuse the cached result instead of
+    # paying the batch fetches + retry sleeps again.
+    cache_key = f"{today} {timeframe}"
+    try:
+        with open(CACHE_FILE) as f:
+            cached = json.load(f)
+        if cached.get("key") == cache_key:
+            print("   📦 Using trends cached earlier today.")
+            return cached["trends"]
+    except (OSError, ValueError):
+        pass
+
     current_trends = {}
     api_failure = False
 
-    # 3. Batch Request (Max 5 keywords allowed by Google)
-    for i in range(0, len(KEYWORDS_LIST), 5):
-        batch = KEYWORDS_LIST[i:i+5]
-        print(f"   -> Fetching batch: {batch}")
-        
-        # --- MANUAL RETRY LOOP ---
-        batch_success = False
-        for attempt in range(3):
-            try:
-                pytrends.build_payload(batch, cat=CATEGORY, timeframe=timeframe, geo=GEO_LOCATION)
-                data = pytrends.interest_over_time()
-                
-                if not data.empty:
-                    if 'isPartial' in data.columns:
-                        data = data.drop(labels=['isPartial'], axis=1)
-                    
-                    # Take the mean of the daily values retrieved so far
-                    means = data.mean().to_dict()
-                    current_trends.update(means)
-                else:
-                    # If no data, assume 0
-                    for kw in batch:
-                        current_trends[kw] = 0.0
-                
-                batch_success = True
-                break # Success! Exit the retry loop
-
-            except Exception as e:
-                print(f"   ⚠️ Warning (Attempt {attempt+1}/3): {e}")
-                time.sleep(random.uniform(2, 4)) # Wait before retrying
-        
-        # If all retries failed, mark as failure and stop trying further batches
-        if not batch_success:
+    # 3. Batch Requests (Max 5 keywords allowed by Google)
+    # The batches are independent, so fire them on parallel threads
+    # instead of serially with 2-5s sleeps in between. Each thread keeps
+    # its own jittered retry wait so a 429 still backs off.
+    batches = [KEYWORDS_LIST[i:i+5] for i in range(0, len(KEYWORDS_LIST), 5)]
+
+    with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+        batch_results = list(pool.map(
+            lambda args: _fetch_batch(args[0], args[1], timeframe), enumerate(batches)))
+
+    for batch, means in zip(batches, batch_results):
+        if means is None:
+            # A batch exhausted its retries - treat the run as failed
             print(f"   ❌ Failed to fetch batch {batch} after 3 attempts.")
             api_failure = True
-            break # Stop processing batches immediately
-
-        time.sleep(random.uniform(2, 5))
+            break
+        current_trends.update(means)
 
     # 4. Handle Results or Fallback
     if api_failure:
         print("   ⚠️ API Rate Limited or Unavailable. Switching to CSV Backup...")
         
-        if os.path.exists(LOG_FILE):
-            try:
-                df = pd.read_csv(LOG_FILE)
-                if not df.empty:
-                    # Get the last row as a dictionary
-                    last_entry = df.iloc[-1].to_dict()
-                    
-                    # Remove timestamp/extra columns if they exist to match format
-                    if 'timestamp' in last_entry:
-                        del last_entry['timestamp']
-                    if 'data_source' in last_entry:
-                        del last_entry['data_source']
-                        
-                    print(f"   📂 Loaded Fallback Data from {LOG_FILE}")
-                    return last_entry
-                else:
-                    print("   ❌ CSV exists but is empty.")
-            except Exception as e:
-                print(f"   ❌ Failed to read CSV: {e}")
-        else:
-            print(f"   ❌ CSV {LOG_FILE} not found.")
+        # Tail-read the last logged row (O(1) I/O, no pandas parse)
+        last_entry = read_last_row(LOG_FILE)
+        if last_entry:
+            # Remove timestamp/extra columns if they exist to match format
+            last_entry.pop('timestamp', None)
+            last_entry.pop('data_source', None)
+
+            print(f"   📂 Loaded Fallback Data from {LOG_FILE}")
+            return last_entry
+        print(f"   ❌ No usable backup entry in {LOG_FILE}.")
             
         # If backup fails too, return zeros to prevent crash
         return {kw: 0.0 for kw in KEYWORDS_LIST}
@@ -127,11 +190,17 @@ def get_current_month_trends():
     # 5. Save to CSV (Only if API was successful)
     log_entry = current_trends.copy()
     log_entry['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    df_log = pd.DataFrame([log_entry])
-    header = not os.path.exists(LOG_FILE)
-    df_log.to_csv(LOG_FILE, mode='a', header=header, index=False)
-    
+
+    append_log_row(LOG_FILE, log_entry)
+
+    # Persist today's result for same-day repeat runs (best effort)
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE, 'w') as f:
+            json.dump({"key": cache_key, "trends": current_trends}, f)
+    except OSError as e:
+        print(f"   ⚠️ Could not write cache {CACHE_FILE}: {e}")
+
     print(f"✅ Success. Data logged to {LOG_FILE}")
     print("   -> Current Signals:", current_trends)
     
@@ -1,18 +1,29 @@
-import requests
-import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-import os
+from concurrent.futures import ThreadPoolExecutor
+
+from http_session import SESSION
+from csv_log import append_log_row, read_last_row
+from month_cache import load_cache, save_cache
 
 # --- CONFIGURATION ---
 # Delhi Coordinates (Connaught Place)
 LAT = 28.61
 LON = 77.20
 LOG_FILE = "daily_weather_log.csv"
+CACHE_FILE = "weather_month_cache.json"
+
+def _nan_sum_count(arr):
+    """Sum and valid-sample count of an array that may contain NaNs."""
+    valid = ~np.isnan(arr)
+    return float(arr[valid].sum()), int(valid.sum())
 
-def get_current_month_weather():
+def get_current_month_weather(fetch_lag=True):
     """
     Fetches Temperature, Humidity, and Rainfall for the current month.
-    Also fetches 'Rainfall_Lag_2' (Rainfall from 2 months ago) for the Water-Borne model.
+    With fetch_lag=True (default) it also fetches 'Rainfall_Lag_2'
+    (Rainfall from 2 months ago) for the Water-Borne model; callers that
+    don't need the lag can skip the archive-API call entirely.
     Returns: dictionary with 'Monthly_Avg_Temp', 'Monthly_Avg_Humidity', 'Rainfall_mm', 'Rainfall_Lag_2'
     FALLBACK: If API fails, reads from the last logged CSV entry.
     """
@@ -21,10 +32,25 @@ def get_current_month_weather():
     # 1. Define Timeframe (1st of Month -> Today)
     today = datetime.today().date()
     first_day = today.replace(day=1)
-    
-    start_str = first_day.strftime("%Y-%m-%d")
-    end_str = today.strftime("%Y-%m-%d")
-    
+    month_key = today.strftime("%Y-%m")
+    today_str = today.strftime("%Y-%m-%d")
+
+    # Month cache: complete days already aggregated on a previous run
+    # don't need to be downloaded again - only fetch from the first
+    # missing day onwards (usually just today).
+    cache = load_cache(CACHE_FILE, month_key)
+    if cache and cache.get("last_day"):
+        fetch_from = datetime.strptime(cache["last_day"], "%Y-%m-%d").date() + timedelta(days=1)
+    else:
+        cache = {"month": month_key, "last_day": None,
+                 "sums": {"temp": 0.0, "humidity": 0.0, "rain": 0.0},
+                 "counts": {"temp": 0, "humidity": 0, "rain": 0},
+                 "lag": None}
+        fetch_from = first_day
+
+    start_str = fetch_from.strftime("%Y-%m-%d")
+    end_str = today_str
+
     print(f"   -> Fetching current data from {start_str} to {end_str}...")
 
     # 2. Build API Request (Current Weather)
@@ -38,11 +64,67 @@ def get_current_month_weather():
         "end_date": end_str
     }
 
+    # --- Lag request (2 Months Ago) is built up-front so both API calls
+    # --- can be fired concurrently instead of back-to-back.
+    first_current = today.replace(day=1)
+    first_prev = (first_current - timedelta(days=1)).replace(day=1) # 1st of Prev Month
+    end_lag = (first_prev - timedelta(days=1))                      # Last day of Lag Month
+    first_lag = end_lag.replace(day=1)                              # 1st day of Lag Month
+
+    start_lag_str = first_lag.strftime("%Y-%m-%d")
+    end_lag_str = end_lag.strftime("%Y-%m-%d")
+    lag_month_key = first_lag.strftime("%Y-%m")
+
+    # The lag month is fully in the past, so its total never changes -
+    # once cached, the archive API call can be skipped entirely.
+    cached_lag = cache.get("lag")
+    lag_cached = bool(cached_lag and cached_lag.get("month") == lag_month_key)
+
+    if fetch_lag and not lag_cached:
+        print(f"   -> Fetching historical rain (Lag 2) from {start_lag_str} to {end_lag_str}...")
+
+    # Use Archive API for historical data
+    url_archive = "https://archive-api.open-meteo.com/v1/archive"
+    params_lag = {
+        "latitude": LAT,
+        "longitude": LON,
+        "hourly": "rain",
+        "timezone": "auto",
+        "start_date": start_lag_str,
+        "end_date": end_lag_str
+    }
+
     try:
-        response = requests.get(url, params=params, timeout=10) # Added timeout
-        response.raise_for_status()
-        data = response.json()
-        
+        # Fire both HTTPS calls in parallel - each is latency-bound, so this
+        # roughly halves the function's wall time.
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            future_current = pool.submit(SESSION.get, url, params=params, timeout=10)
+            future_lag = None
+            if fetch_lag and not lag_cached:
+                future_lag = pool.submit(SESSION.get, url_archive, params=params_lag, timeout=10)
+
+            response = future_current.result()
+            response.raise_for_status()
+            data = response.json()
+
+            lag_rain = float(cached_lag["total"]) if lag_cached else 0.0
+            if future_lag is not None:
+                try:
+                    resp_lag = future_lag.result()
+                    resp_lag.raise_for_status()
+                    data_lag = resp_lag.json()
+                    rains_lag = data_lag.get('hourly', {}).get('rain', [])
+                    # Sum in NumPy (None gaps -> NaN) instead of a
+                    # per-element Python generator loop
+                    if rains_lag:
+                        lag_arr = np.array([x if x is not None else np.nan for x in rains_lag],
+                                           dtype=np.float64)
+                        lag_rain = float(np.nansum(lag_arr))
+                    cache["lag"] = {"month": lag_month_key, "total": lag_rain}
+                except Exception as e:
+                    print(f"   ⚠️ Error fetching lag data: {e}")
+                    # We default to 0.0 if history fetch fails, so the model doesn't crash
+
         # 3. Process Hourly Data
         hourly = data.get('hourly', {})
         timestamps = hourly.get('time', [])
@@ -53,57 +135,37 @@ def get_current_month_weather():
         if not timestamps:
             raise ValueError("No data returned from API")
 
-        # Create DataFrame
-        df = pd.DataFrame({
-            'time': pd.to_datetime(timestamps),
-            'temp': temps,
-            'humidity': humidities,
-            'rain': rains
-        })
-        
         # 4. Calculate Aggregates for the Model
-        avg_temp = df['temp'].mean()
-        avg_humidity = df['humidity'].mean()
-        total_rain = df['rain'].sum()
-        
-        # --- NEW: Fetch Historical Lag Data (2 Months Ago) ---
-        # The Water-Borne model needs 'Rainfall_Lag_2'.
-        
-        # Calculate dates for 2 months ago
-        first_current = today.replace(day=1)
-        first_prev = (first_current - timedelta(days=1)).replace(day=1) # 1st of Prev Month
-        end_lag = (first_prev - timedelta(days=1))                      # Last day of Lag Month
-        first_lag = end_lag.replace(day=1)                              # 1st day of Lag Month
-        
-        start_lag_str = first_lag.strftime("%Y-%m-%d")
-        end_lag_str = end_lag.strftime("%Y-%m-%d")
-        
-        print(f"   -> Fetching historical rain (Lag 2) from {start_lag_str} to {end_lag_str}...")
-        
-        # Use Archive API for historical data
-        url_archive = "https://archive-api.open-meteo.com/v1/archive"
-        params_lag = {
-            "latitude": LAT,
-            "longitude": LON,
-            "hourly": "rain",
-            "timezone": "auto",
-            "start_date": start_lag_str,
-            "end_date": end_lag_str
-        }
-        
-        lag_rain = 0.0
-        try:
-            resp_lag = requests.get(url_archive, params=params_lag, timeout=10)
-            resp_lag.raise_for_status()
-            data_lag = resp_lag.json()
-            rains_lag = data_lag.get('hourly', {}).get('rain', [])
-            # Sum filtering out Nones
-            if rains_lag:
-                lag_rain = sum(r for r in rains_lag if r is not None)
-        except Exception as e:
-            print(f"   ⚠️ Error fetching lag data: {e}")
-            # We default to 0.0 if history fetch fails, so the model doesn't crash
-        
+        # Raw NumPy is plenty here - no need to build a DataFrame just to
+        # average three columns. Completed days get folded into the month
+        # cache's running sums/counts; today's partial hours are only
+        # added on top for this run's result, so tomorrow refetches them.
+        temps_arr = np.array([x if x is not None else np.nan for x in temps], dtype=np.float64)
+        humidity_arr = np.array([x if x is not None else np.nan for x in humidities], dtype=np.float64)
+        rains_arr = np.array([x if x is not None else np.nan for x in rains], dtype=np.float64)
+
+        days = np.array([t[:10] for t in timestamps])
+        complete = days < today_str
+
+        for field, arr in (("temp", temps_arr), ("humidity", humidity_arr), ("rain", rains_arr)):
+            s, n = _nan_sum_count(arr[complete])
+            cache["sums"][field] += s
+            cache["counts"][field] += n
+
+        if complete.any():
+            cache["last_day"] = str(days[complete].max())
+        save_cache(CACHE_FILE, cache)
+
+        # Month-to-date stats = cached complete days + today's partial hours
+        stats = {}
+        for field, arr in (("temp", temps_arr), ("humidity", humidity_arr), ("rain", rains_arr)):
+            s, n = _nan_sum_count(arr[~complete])
+            stats[field] = (cache["sums"][field] + s, cache["counts"][field] + n)
+
+        avg_temp = stats["temp"][0] / max(stats["temp"][1], 1)
+        avg_humidity = stats["humidity"][0] / max(stats["humidity"][1], 1)
+        total_rain = stats["rain"][0]
+
         results = {
             'Monthly_Avg_Temp': round(avg_temp, 2),
             'Monthly_Avg_Humidity': round(avg_humidity, 2),
@@ -115,10 +177,8 @@ def get_current_month_weather():
         log_entry = results.copy()
         log_entry['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry['data_source'] = "Open-Meteo Weather API"
-        
-        df_log = pd.DataFrame([log_entry])
-        header = not os.path.exists(LOG_FILE)
-        df_log.to_csv(LOG_FILE, mode='a', header=header, index=False)
+
+        append_log_row(LOG_FILE, log_entry)
         
         print(f"✅ Success. Data logged to {LOG_FILE}")
         print(f"   -> Results: Temp: {results['Monthly_Avg_Temp']}°C, Rain: {results['Rainfall_mm']}mm, Humidity: {results['Monthly_Avg_Humidity']}%,Lag Rain: {results['Rainfall_Lag_2']}mm")
@@ -130,27 +190,19 @@ def get_current_month_weather():
         print("   ⚠️ API Unavailable. Attempting to read from local CSV backup...")
         
         # --- FALLBACK MECHANISM ---
-        if os.path.exists(LOG_FILE):
-            try:
-                df = pd.read_csv(LOG_FILE)
-                if not df.empty:
-                    # Get the last row
-                    last_entry = df.iloc[-1]
-                    results = {
-                        'Monthly_Avg_Temp': float(last_entry.get('Monthly_Avg_Temp', 0)),
-                        'Monthly_Avg_Humidity': float(last_entry.get('Monthly_Avg_Humidity', 0)),
-                        'Rainfall_mm': float(last_entry.get('Rainfall_mm', 0)),
-                        'Rainfall_Lag_2': float(last_entry.get('Rainfall_Lag_2', 0))
-                    }
-                    print(f"   📂 Loaded Fallback Data from {LOG_FILE}")
-                    print(f"   -> Results: Temp: {results['Monthly_Avg_Temp']}°C, Rain: {results['Rainfall_mm']}mm, Humidity: {results['Monthly_Avg_Humidity']}%,Lag Rain: {results['Rainfall_Lag_2']}mm")
-                    return results
-                else:
-                    print("   ❌ CSV exists but is empty.")
-            except Exception as csv_err:
-                print(f"   ❌ Failed to read CSV: {csv_err}")
-        else:
-            print(f"   ❌ CSV {LOG_FILE} not found.")
+        # Tail-read the last logged row (O(1) I/O, no pandas parse)
+        last_entry = read_last_row(LOG_FILE)
+        if last_entry:
+            results = {
+                'Monthly_Avg_Temp': float(last_entry.get('Monthly_Avg_Temp', 0)),
+                'Monthly_Avg_Humidity': float(last_entry.get('Monthly_Avg_Humidity', 0)),
+                'Rainfall_mm': float(last_entry.get('Rainfall_mm', 0)),
+                'Rainfall_Lag_2': float(last_entry.get('Rainfall_Lag_2', 0))
+            }
+            print(f"   📂 Loaded Fallback Data from {LOG_FILE}")
+            print(f"   -> Results: Temp: {results['Monthly_Avg_Temp']}°C, Rain: {results['Rainfall_mm']}mm, Humidity: {results['Monthly_Avg_Humidity']}%,Lag Rain: {results['Rainfall_Lag_2']}mm")
+            return results
+        print(f"   ❌ No usable backup entry in {LOG_FILE}.")
 
         # Final Fallback
         return {'Monthly_Avg_Temp': 0, 'Monthly_Avg_Humidity': 0, 'Rainfall_mm': 0, 'Rainfall_Lag_2': 0}
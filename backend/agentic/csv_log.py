@@ -0,0 +1,74 @@
+import csv
+import os
+
+# --- SHARED CSV LOGGING ---
+# Every agent logs exactly one row per run. Building a single-row
+# DataFrame and calling .to_csv(mode='a') for that pays pandas writer
+# setup + type inference each time; the stdlib csv writer with one
+# buffered open is all that's needed.
+
+def read_last_row(log_file):
+    """
+    Returns the most recent log entry as a dict, or None if the file is
+    missing or holds no data rows. Reads the header plus only the tail
+    of the file (reverse seek) instead of parsing the whole CSV - the
+    logs grow by a row per run, so a full read is O(history).
+    Numeric-looking values come back as floats.
+    """
+    try:
+        with open(log_file, 'rb') as f:
+            header_line = f.readline()
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(len(header_line), size - 4096))
+            tail = f.read().decode('utf-8', errors='replace').strip().splitlines()
+    except OSError:
+        return None
+
+    if not header_line or not tail:
+        return None
+
+    fieldnames = next(csv.reader([header_line.decode('utf-8', errors='replace').strip()]))
+    values = next(csv.reader([tail[-1]]))
+    if len(values) != len(fieldnames):
+        return None
+
+    row = {}
+    for key, value in zip(fieldnames, values):
+        try:
+            row[key] = float(value)
+        except ValueError:
+            row[key] = value
+    return row
+
+# Per-process memo of which log files already have a header, so a
+# long-running server stats each file once instead of on every write.
+_HEADER_WRITTEN = {}
+
+def _needs_header(log_file):
+    known = _HEADER_WRITTEN.get(log_file)
+    if known is None:
+        known = os.path.exists(log_file)
+    _HEADER_WRITTEN[log_file] = True  # after this write the header exists
+    return not known
+
+def append_log_row(log_file, row):
+    """
+    Appends one log entry (a dict) to a CSV file.
+    Writes the header only when the file does not exist yet.
+    """
+    append_log_rows(log_file, [row])
+
+def append_log_rows(log_file, rows):
+    """
+    Flushes a batch of log entries (list of dicts) with a single
+    buffered open + writerows call. Column order follows the first row.
+    """
+    if not rows:
+        return
+    write_header = _needs_header(log_file)
+    with open(log_file, 'a', newline='', buffering=8192) as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
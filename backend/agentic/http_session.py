@@ -0,0 +1,13 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- SHARED HTTP SESSION ---
+# Every agent used to call requests.get(...) directly, paying a fresh
+# TCP + TLS handshake (~100-300ms to open-meteo) on every single call.
+# A shared Session keeps connections alive, so warm invocations
+# (scheduler loops, repeated API scans) reuse the pooled sockets.
+SESSION = requests.Session()
+
+_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
@@ -0,0 +1,37 @@
+import json
+import os
+
+# --- ON-DISK MONTH CACHE ---
+# For daily cron runs the agents used to re-download and re-aggregate
+# the entire month-to-date on every invocation, even though only the
+# newest day changed. Each agent persists its running month aggregates
+# in a small JSON file here and only fetches the days it hasn't folded
+# in yet.
+
+CACHE_DIR = "cache"
+
+def load_cache(filename, month_key):
+    """
+    Loads a cache dict from CACHE_DIR/filename.
+    Returns None if the file is missing, unreadable, or belongs to a
+    different month than month_key (stale caches are simply discarded).
+    """
+    path = os.path.join(CACHE_DIR, filename)
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        if cache.get("month") == month_key:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return None
+
+def save_cache(filename, cache):
+    """Writes a cache dict to CACHE_DIR/filename (best effort)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, filename)
+    try:
+        with open(path, 'w') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"   ⚠️ Could not write cache {path}: {e}")
@@ -1,8 +1,25 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import joblib
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+# onnxruntime is optional: when present (and the training script
+# exported .onnx copies), predictions run through its C++ tree kernels
+# instead of sklearn's Python predict path.
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+class _OnnxModel:
+    """Thin .predict wrapper so an ONNX session drops in for a sklearn model."""
+    def __init__(self, path):
+        self.sess = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+        self.input_name = self.sess.get_inputs()[0].name
+
+    def predict(self, X):
+        return self.sess.run(None, {self.input_name: np.asarray(X, dtype=np.float32)})[0].ravel()
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -18,24 +35,46 @@ def load_models():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     models_dir = os.path.join(base_dir, "models")
     
-    models = {}
     model_files = {
         'Rate_Vector': 'Rate_Vector_model.pkl',
         'Rate_Respiratory': 'Rate_Respiratory_model.pkl',
         'Rate_Water': 'Rate_Water_model.pkl'
     }
-    
+
+    paths = {}
     for key, filename in model_files.items():
-        path = os.path.join(models_dir, filename)
-        if os.path.exists(path):
-            models[key] = joblib.load(path)
+        # Prefer the ONNX export when onnxruntime is installed;
+        # otherwise fall back to the joblib pickle.
+        onnx_path = os.path.join(models_dir, f"{key}_model.onnx")
+        pkl_path = os.path.join(models_dir, filename)
+        if ort is not None and os.path.exists(onnx_path):
+            paths[key] = onnx_path
+        elif os.path.exists(pkl_path):
+            paths[key] = pkl_path
         else:
             st.error(f"⚠️ Model file not found: {filename}. Please run training script first.")
             return None
-    return models
+
+    def _load(path):
+        if path.endswith('.onnx'):
+            return _OnnxModel(path)
+        # mmap keeps the tree arrays paged on demand instead of copied
+        return joblib.load(path, mmap_mode='r')
+
+    # Load the three models concurrently (cold start pays the slowest
+    # load instead of the sum).
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        return dict(zip(paths.keys(), pool.map(_load, paths.values())))
 
 models = load_models()
 
+# Reusable single-row prediction buffers. sklearn tree models accept a
+# bare ndarray, so filling these in place skips the per-rerun DataFrame
+# construction (dict -> BlockManager -> index) the predicts used to pay.
+vec_buf = np.empty((1, 6), dtype=np.float32)
+resp_buf = np.empty((1, 7), dtype=np.float32)
+wat_buf = np.empty((1, 7), dtype=np.float32)
+
 # --- SIDEBAR: ENVIRONMENTAL CONTROLS ---
 st.sidebar.header("🌍 Environmental Conditions")
 st.sidebar.markdown("Simulate next month's weather:")
@@ -87,23 +126,25 @@ with st.expander("🏥 Current Hospital Load (Baseline)", expanded=False):
 
 # --- PREDICTION LOGIC ---
 if models:
-    # 1. VECTOR MODEL PREDICTION
-    # Features: ['Monthly_Avg_Temp', 'Rainfall_mm', 'Monthly_Avg_Humidity', 'dengue', 'fever', 'Rate_Vector']
-    vec_input = pd.DataFrame([[avg_temp, rainfall, humidity, trend_dengue, trend_fever, curr_vector]], 
-                             columns=['Monthly_Avg_Temp', 'Rainfall_mm', 'Monthly_Avg_Humidity', 'dengue', 'fever', 'Rate_Vector'])
-    vec_pred = models['Rate_Vector'].predict(vec_input)[0]
-
-    # 2. RESPIRATORY MODEL PREDICTION
-    # Features: ['Monthly_Avg_AQI', 'Days_Severe_AQI', 'Monthly_Avg_Temp', 'asthma', 'cough', 'cold', 'Rate_Respiratory']
-    resp_input = pd.DataFrame([[aqi, days_severe, avg_temp, trend_asthma, trend_cough, trend_cold, curr_resp]], 
-                              columns=['Monthly_Avg_AQI', 'Days_Severe_AQI', 'Monthly_Avg_Temp', 'asthma', 'cough', 'cold', 'Rate_Respiratory'])
-    resp_pred = models['Rate_Respiratory'].predict(resp_input)[0]
-
-    # 3. WATER MODEL PREDICTION
-    # Features: ['Monthly_Avg_Temp', 'Rainfall_mm', 'Rainfall_Lag_2', 'loose motion', 'vomiting', 'stomach pain', 'Rate_Water']
-    wat_input = pd.DataFrame([[avg_temp, rainfall, rain_lag_2, trend_loose, trend_vomit, trend_stomach, curr_water]], 
-                             columns=['Monthly_Avg_Temp', 'Rainfall_mm', 'Rainfall_Lag_2', 'loose motion', 'vomiting', 'stomach pain', 'Rate_Water'])
-    wat_pred = models['Rate_Water'].predict(wat_input)[0]
+    # Fill the three input buffers, then run the predicts together.
+    # Feature orders match the training script:
+    # Vector: ['Monthly_Avg_Temp', 'Rainfall_mm', 'Monthly_Avg_Humidity', 'dengue', 'fever', 'Rate_Vector']
+    vec_buf[0] = (avg_temp, rainfall, humidity, trend_dengue, trend_fever, curr_vector)
+    # Respiratory: ['Monthly_Avg_AQI', 'Days_Severe_AQI', 'Monthly_Avg_Temp', 'asthma', 'cough', 'cold', 'Rate_Respiratory']
+    resp_buf[0] = (aqi, days_severe, avg_temp, trend_asthma, trend_cough, trend_cold, curr_resp)
+    # Water: ['Monthly_Avg_Temp', 'Rainfall_mm', 'Rainfall_Lag_2', 'loose motion', 'vomiting', 'stomach pain', 'Rate_Water']
+    wat_buf[0] = (avg_temp, rainfall, rain_lag_2, trend_loose, trend_vomit, trend_stomach, curr_water)
+
+    # sklearn tree ensembles release the GIL inside predict, so the
+    # three traversals genuinely overlap on threads - the rerun pays
+    # the slowest model instead of all three in sequence.
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        vec_pred, resp_pred, wat_pred = (
+            p[0] for p in pool.map(
+                lambda mx: mx[0].predict(mx[1]),
+                [(models['Rate_Vector'], vec_buf),
+                 (models['Rate_Respiratory'], resp_buf),
+                 (models['Rate_Water'], wat_buf)]))
 
     # --- DISPLAY RESULTS ---
     st.markdown("---")
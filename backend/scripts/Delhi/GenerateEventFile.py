@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import os
 # 1. Create Monthly Timeline (2017-2019)
 dates = pd.date_range(start='2017-01-01', end='2019-12-01', freq='MS')
@@ -17,33 +18,51 @@ eid_dates = [
     (6, 2019), (8, 2019)
 ]
 
-# 3. Helper Function to Flag Events
-def check_event(row, date_list):
-    # Returns 1 if the (Month, Year) exists in the provided list
-    return 1 if (row['Date'].month, row['Date'].year) in date_list else 0
+# 3. Vectorized Flagging
+# The timeline is fixed to 2017-2019, so each event list collapses to a
+# 12x3 int8 table indexed by (month-1, year-2017). Flagging a column is
+# then a single indexed gather per row - no sorting or membership test
+# as np.isin needs.
+m = df['Date'].dt.month.to_numpy()
+y = df['Date'].dt.year.to_numpy()
+m_idx = m - 1
+y_idx = y - 2017
+
+def event_table(date_list):
+    # int8 - the flags are 0/1, so int64 would spend 8x the bytes per
+    # column through the downstream merge.
+    table = np.zeros((12, 3), dtype=np.int8)
+    for mm, yy in date_list:
+        table[mm - 1, yy - 2017] = 1
+    return table
 
 # 4. Apply Logic for Variable Events
-df['Has_Diwali'] = df.apply(lambda x: check_event(x, diwali_dates), axis=1)
-df['Has_Holi'] = df.apply(lambda x: check_event(x, holi_dates), axis=1)
-df['Has_Dussehra'] = df.apply(lambda x: check_event(x, dussehra_dates), axis=1)
-df['Has_Eid'] = df.apply(lambda x: check_event(x, eid_dates), axis=1)
+df['Has_Diwali'] = event_table(diwali_dates)[m_idx, y_idx]
+df['Has_Holi'] = event_table(holi_dates)[m_idx, y_idx]
+df['Has_Dussehra'] = event_table(dussehra_dates)[m_idx, y_idx]
+df['Has_Eid'] = event_table(eid_dates)[m_idx, y_idx]
 
 # 5. Apply Logic for Fixed Events & Seasons
 # Independence Day is always August (Month 8)
-df['Has_Independence_Day'] = df['Date'].apply(lambda x: 1 if x.month == 8 else 0)
+df['Has_Independence_Day'] = (m == 8).astype(np.int8)
 
 # Republic Day is always January (Month 1)
-df['Has_Republic_Day'] = df['Date'].apply(lambda x: 1 if x.month == 1 else 0)
+df['Has_Republic_Day'] = (m == 1).astype(np.int8)
 
 # Crop Burning Season (Stubble Burning)
 # Typically peaks in October (10) and November (11) in Delhi
-df['Has_Crop_Burning'] = df['Date'].apply(lambda x: 1 if x.month in [10, 11] else 0)
+df['Has_Crop_Burning'] = np.isin(m, [10, 11]).astype(np.int8)
 
 output_filename = 'Delhi_Major_Events_2017_2019.csv'
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_FILE = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "processed", output_filename))
-# 6. Save to CSV
+# 6. Save the CSV first, then the best-effort Parquet sidecar for the
+# Merge step (Merge falls back to the CSV without a parquet engine)
 df.to_csv(OUTPUT_FILE, index=False)
+try:
+    df.to_parquet(OUTPUT_FILE.replace('.csv', '.parquet'), index=False)
+except (ImportError, OSError) as e:
+    print(f"⚠️ Skipped Parquet sidecar: {e}")
 
 print(f"File '{OUTPUT_FILE}' generated successfully.")
 print(df.head(12)) # Preview the first year
\ No newline at end of file
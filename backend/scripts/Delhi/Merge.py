@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import os
 
 # Define paths
@@ -9,17 +10,39 @@ OUTPUT_FILE = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "final"
 # Global variable to hold data between functions
 master_df = None
 
+# Use PyArrow's multi-threaded CSV reader when available - the default C
+# engine parses single-threaded with Python-level dtype inference.
+try:
+    import pyarrow  # noqa: F401
+    _CSV_ENGINE = {'engine': 'pyarrow'}
+except ImportError:
+    _CSV_ENGINE = {}
+
+def _read_processed_csv(filename):
+    # Prefer the typed Parquet intermediate when the producing script
+    # wrote one: columnar, compressed, and already carrying real dtypes,
+    # so there is no text parse or datetime re-inference. Inputs that
+    # only exist as CSV (e.g. the hand-curated hospital data) still load
+    # through the CSV path.
+    parquet_path = os.path.join(RAW_DATA_PATH, filename.replace('.csv', '.parquet'))
+    if os.path.exists(parquet_path):
+        df = pd.read_parquet(parquet_path)
+        if df.index.name:
+            df = df.reset_index()
+        return df
+    return pd.read_csv(os.path.join(RAW_DATA_PATH, filename), **_CSV_ENGINE)
+
 def create_master_dataset():
     global master_df
     print("Loading datasets...")
-    
+
     # 1. Load all CSV files
     # Note: Ensure these files are in the same directory as this script or update paths
-    df_hospital = pd.read_csv(os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "processed", "Delhi_Hospital_Data.csv"))) 
-    df_events = pd.read_csv(os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "processed", "Delhi_Major_Events_2017_2019.csv")))
-    df_weather = pd.read_csv(os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "processed", "Delhi_Weather_Processed.csv")))
-    df_aqi = pd.read_csv(os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "processed", "Delhi_AQI_Processed_2017_2019.csv")))
-    df_trends = pd.read_csv(os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "processed", "Delhi_Google_Trends_Health.csv")))
+    df_hospital = _read_processed_csv("Delhi_Hospital_Data.csv")
+    df_events = _read_processed_csv("Delhi_Major_Events_2017_2019.csv")
+    df_weather = _read_processed_csv("Delhi_Weather_Processed.csv")
+    df_aqi = _read_processed_csv("Delhi_AQI_Processed_2017_2019.csv")
+    df_trends = _read_processed_csv("Delhi_Google_Trends_Health.csv")
 
     # ---------------------------------------------------------
     # 2. Process Hospital Data (The Target)
@@ -36,6 +59,11 @@ def create_master_dataset():
     # Convert Date strings to proper Datetime objects
     df_hospital_long['Date'] = pd.to_datetime(df_hospital_long['Date'], format='%d-%m-%Y')
 
+    # The long disease names repeat for every month - as a categorical
+    # they are stored once plus integer codes, and every downstream
+    # isin/map/sort hashes small ints instead of long strings.
+    df_hospital_long['Name'] = df_hospital_long['Name'].astype('category')
+
     # ---------------------------------------------------------
     # 3. Process External Data (The Features)
     # ---------------------------------------------------------
@@ -57,15 +85,30 @@ def create_master_dataset():
     # 4. Merge Everything (Left Join)
     # ---------------------------------------------------------
     print("Merging datasets...")
-    
-    master_df = df_hospital_long.merge(df_events, on='Date', how='left')
-    master_df = master_df.merge(df_weather, on='Date', how='left')
-    master_df = master_df.merge(df_aqi, on='Date', how='left')
-    master_df = master_df.merge(df_trends, on='Date', how='left')
+
+    # Index every feature frame on Date and join them in one pass. The
+    # old chain of four .merge calls ran four hash joins, each copying
+    # the whole growing frame.
+    for feature_df in (df_events, df_weather, df_aqi, df_trends):
+        feature_df.set_index('Date', inplace=True)
+
+    master_df = (
+        df_hospital_long.set_index('Date')
+        .join([df_events, df_weather, df_aqi, df_trends], how='left')
+        .reset_index()
+    )
 
     # Clean up
     master_df.sort_values(by=['Date', 'Name'], inplace=True)
-    master_df.fillna(method='ffill', inplace=True)
+
+    # Forward-fill only the time-continuous environmental columns. A
+    # global ffill would also drag stale values into the Patient_Count
+    # target and name strings, and scans every column for nothing.
+    env_cols = [c for c in ('Monthly_Avg_Temp', 'Monthly_Avg_Humidity',
+                            'Monthly_Avg_Wind', 'Rainfall_mm',
+                            'Monthly_Avg_AQI', 'Monthly_Max_AQI',
+                            'Days_Severe_AQI') if c in master_df.columns]
+    master_df[env_cols] = master_df[env_cols].ffill()
     print("Master dataset created in memory.")
 
 
@@ -97,8 +140,9 @@ def group_and_refine_data():
     # Filter only for the rows present in our map
     df = master_df[master_df['Name'].isin(name_map.keys())].copy()
     
-    # Apply the short names
-    df['Short_Name'] = df['Name'].map(name_map)
+    # Apply the short names (categorical as well, so the pivot hashes
+    # integer codes rather than strings)
+    df['Short_Name'] = df['Name'].map(name_map).astype('category')
 
     # 2. PIVOT THE TABLE
     print("Pivoting data to wide format...")
@@ -117,35 +161,53 @@ def group_and_refine_data():
         'stomach pain', 'chest pain', 'headache', 'fatigue'
     ]
     
+    # Pivot on Date alone - the feature columns are all functionally
+    # dependent on Date, so hashing them into the pivot key just makes
+    # every composite key 18 columns wide. Pivot on the real key and
+    # merge the per-Date feature block back afterwards.
     df_wide = df.pivot_table(
-        index=feature_cols,
+        index='Date',
         columns='Short_Name',
         values='Patient_Count',
         aggfunc='sum'
     ).reset_index()
 
+    features = df.drop_duplicates('Date')[feature_cols]
+    df_wide = df_wide.merge(features, on='Date', how='left')
+
     # Fill NaNs before calculation
     df_wide.fillna(0, inplace=True)
 
     # 3. CREATE GROUPS
     print("Creating Disease Groups...")
-    
-    df_wide['Group_Respiratory'] = df_wide['Asthma_COPD'] + df_wide['Tuberculosis']
-    df_wide['Group_Vector'] = df_wide['Dengue'] + df_wide['Malaria'] + df_wide['Fever_Unknown']
-    df_wide['Group_Water'] = df_wide['Diarrhea_Adult'] + df_wide['Diarrhea_Child'] + df_wide['Typhoid'] + df_wide['Hepatitis']
-    df_wide['Group_Trauma'] = df_wide['Trauma'] + df_wide['Cardiac'] + df_wide['Burn']
+
+    # All four group sums as one matmul against a fixed disease->group
+    # one-hot matrix: a single BLAS pass over the block instead of four
+    # separate column-sum sweeps.
+    group_map = {
+        'Group_Respiratory': ['Asthma_COPD', 'Tuberculosis'],
+        'Group_Vector': ['Dengue', 'Malaria', 'Fever_Unknown'],
+        'Group_Water': ['Diarrhea_Adult', 'Diarrhea_Child', 'Typhoid', 'Hepatitis'],
+        'Group_Trauma': ['Trauma', 'Cardiac', 'Burn'],
+    }
+    disease_cols = [c for members in group_map.values() for c in members]
+    W = np.zeros((len(disease_cols), len(group_map)))
+    for g_idx, members in enumerate(group_map.values()):
+        for name in members:
+            W[disease_cols.index(name), g_idx] = 1.0
+
+    groups = df_wide[disease_cols].to_numpy(dtype=np.float64) @ W
+    df_wide[list(group_map)] = groups
 
     # ---------------------------------------------------------
     # 4. NORMALIZE
     # ---------------------------------------------------------
     print("Normalizing data (Cases per 1000 Emergency Visits)...")
-    
-    denominator = df_wide['Total_Emergency_Footfall'].replace(0, 1)
-    
-    df_wide['Rate_Respiratory'] = (df_wide['Group_Respiratory'] / denominator) * 1000
-    df_wide['Rate_Vector'] = (df_wide['Group_Vector'] / denominator) * 1000
-    df_wide['Rate_Water'] = (df_wide['Group_Water'] / denominator) * 1000
-    df_wide['Rate_Trauma'] = (df_wide['Group_Trauma'] / denominator) * 1000
+
+    denominator = df_wide['Total_Emergency_Footfall'].replace(0, 1).to_numpy(dtype=np.float64)
+
+    rate_cols = ['Rate_Respiratory', 'Rate_Vector', 'Rate_Water', 'Rate_Trauma']
+    df_wide[rate_cols] = groups / denominator[:, None] * 1000
 
     # 5. SAVE
     df_wide.to_csv(OUTPUT_FILE, index=False)
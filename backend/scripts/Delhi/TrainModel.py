@@ -14,6 +14,13 @@ INPUT_FILE = os.path.abspath(os.path.join(BASE_DIR, "..", "..", "data", "final",
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+# Dump the models uncompressed: joblib cannot memory-map a compressed
+# pickle, and the dashboard loads these with mmap_mode='r' so the tree
+# arrays page in on demand at cold start. The few extra MB on disk are
+# a better trade than losing the mmap (and the float32 feature cast
+# already halves the array payload).
+DUMP_COMPRESS = 0
+
 # --- THE EXPERT MODELS CONFIGURATION ---
 # REMOVED: Rate_Trauma (Because accidents are random and cannot be predicted by weather)
 EXPERTS = {
@@ -67,7 +74,9 @@ def train_experts():
         clean_data = df.dropna(subset=['Target_Next_Month', 'Rainfall_Lag_2'] + config['features']).copy()
 
         # 2. Select Features
-        X = clean_data[config['features']]
+        # float32 halves the memory the forest touches during fit and
+        # predict (sklearn trees work in float32 internally anyway).
+        X = clean_data[config['features']].astype(np.float32)
         y = clean_data['Target_Next_Month']
 
         # 3. Train/Test Split
@@ -79,7 +88,19 @@ def train_experts():
 
         # 5. Save Model
         model_filename = os.path.join(MODELS_DIR, f"{target_col}_model.pkl")
-        joblib.dump(model, model_filename)
+        joblib.dump(model, model_filename, compress=DUMP_COMPRESS)
+
+        # Also export ONNX so the dashboard can predict through
+        # onnxruntime's C++ tree kernels (needs skl2onnx; skipped when absent)
+        try:
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import FloatTensorType
+            onx = convert_sklearn(model, initial_types=[
+                ('X', FloatTensorType([None, len(config['features'])]))])
+            with open(os.path.join(MODELS_DIR, f"{target_col}_model.onnx"), "wb") as f:
+                f.write(onx.SerializeToString())
+        except ImportError:
+            pass
 
         # 6. Evaluate
         preds = model.predict(X_test)